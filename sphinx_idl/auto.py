@@ -8,17 +8,65 @@
 
 import os.path
 import glob
+import re
 from docutils.parsers.rst import Directive, directives
-from docutils import io, nodes, utils
-from docutils.statemachine import ViewList
-from docutils.utils.error_reporting import SafeString, ErrorString
+from docutils import nodes, utils
+from docutils.statemachine import StringList, ViewList
 from sphinx import addnodes
-from sphinx.ext.autosummary import autosummary_table
 
-from .parser import IDLParser
 
 __all__ = ["setup", "IDLAutoFile", "IDLAutoPath"]
 
+#: Summary table cells which are just a cross reference to a routine.
+xref_cell_re = re.compile(r"^:idl:(pro|func|class):`([^`<>]+)`$")
+
+#: Summary text which docutils would parse as a single paragraph of plain text: no inline markup, and no start
+#: of a list, block quote or other body element.
+plain_text_re = re.compile(
+    r"""^(?!(?:\d+|[a-z]|[ivxlcdm]+)[.)](?:\s|$))  # not an enumerated list
+    [a-z0-9][\w ,.;'"()!?%/=+-]*$                  # no inline markup characters
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+#: Underscores which start an inline target or end a reference.
+reference_re = re.compile(r"(?<!\w)_|_(?!\w)")
+
+
+class IDLSourceFile:
+    """The decoded contents of an IDL source file."""
+
+    def __init__(self, source_path, text):
+        super().__init__()
+        self.source_path = source_path
+        self.text = text
+
+    @classmethod
+    def open(cls, path, encoding, error_handler="strict"):
+        """Read and decode a file, skipping decoding work for pure ASCII files, which are almost all IDL sources."""
+        with open(path, "rb") as stream:
+            data = stream.read()
+        if data.isascii():
+            text = data.decode("ascii")
+        else:
+            text = data.decode(encoding or "utf-8-sig", error_handler)
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return cls(path, text)
+
+    def read(self):
+        """The contents of the file."""
+        return self.text
+
+    def readlines(self):
+        """The lines of the file."""
+        return self.text.splitlines(True)
+
+
+def is_class_definition(obj):
+    """Whether a routine is the ``Class__define`` procedure which defines an object class."""
+    return obj.kind == "pro" and obj.classname is not None and obj.name.lower().endswith("__define")
+
 
 class IDLAutoBase(Directive):
     """A base class for IDLAuto tools"""
@@ -27,7 +75,12 @@ class IDLAutoBase(Directive):
     required_arguments = 1
     optional_arguments = 0
     final_argument_whitespace = True
-    option_spec = {"encoding": directives.encoding, "absolute": directives.flag, "summary": directives.flag}
+    option_spec = {
+        "encoding": directives.encoding,
+        "absolute": directives.flag,
+        "summary": directives.flag,
+        "calls": directives.flag,
+    }
 
     def read(self, path):
         """Read the file."""
@@ -44,35 +97,60 @@ class IDLAutoBase(Directive):
         e_handler = self.state.document.settings.input_encoding_error_handler
         try:
             self.state.document.settings.record_dependencies.add(path)
-            include_file = io.FileInput(source_path=path, encoding=encoding, error_handler=e_handler)
+            include_file = IDLSourceFile.open(path, encoding, e_handler)
         except UnicodeEncodeError:
+            from docutils.utils.error_reporting import SafeString
+
             raise self.severe(
                 'Problems with "%s" directive path:\n'
                 'Cannot encode input file path "%s" '
                 "(wrong locale?)." % (self.name, SafeString(path))
             )
         except OSError as error:
+            from docutils.utils.error_reporting import ErrorString
+
             raise self.severe(f'Problems with "{self.name}" directive path:\n{ErrorString(error)}.')
+        except UnicodeError as error:
+            from docutils.utils.error_reporting import ErrorString
+
+            raise self.severe('Problem with "%s" directive:\n%s' % (self.name, ErrorString(error))) from error
         return include_file
 
     def get_row(self, *column_texts):
         """Get the nodes for an individual table row."""
         row = nodes.row("")
         for text in column_texts:
-            node = nodes.paragraph("")
-            vl = ViewList()
-            vl.append(text, "<autosummary>")
-            self.state.nested_parse(vl, 0, node)
-            try:
-                if isinstance(node[0], nodes.paragraph):
-                    node = node[0]
-            except IndexError:
-                pass
-            row.append(nodes.entry("", node))
+            row.append(nodes.entry("", self.get_cell(text)))
         return row
 
+    def get_cell(self, text):
+        """Get the paragraph for a table cell, only running the full parser on text which needs it."""
+        match = xref_cell_re.match(text)
+        if match:
+            role = self.state.document.settings.env.get_domain("idl").role(match.group(1))
+            result, messages = role(f"idl:{match.group(1)}", text, match.group(2), self.lineno, self.state.inliner)
+            return nodes.paragraph(text, "", *result, *messages)
+        if not text.strip():
+            return nodes.paragraph("")
+        if text == text.strip() and plain_text_re.match(text) and not reference_re.search(text):
+            return nodes.paragraph(text, text)
+
+        node = nodes.paragraph("")
+        vl = ViewList()
+        vl.append(text, "<autosummary>")
+        self.state.nested_parse(vl, 0, node)
+        try:
+            if isinstance(node[0], nodes.paragraph):
+                node = node[0]
+        except IndexError:
+            pass
+        return node
+
     def get_table(self):
         """docstring for get_table"""
+        # Imported here, as autosummary pulls in most of autodoc.
+        from sphinx.ext.autosummary import autosummary_table
+
         table_spec = addnodes.tabular_col_spec()
         table_spec["spec"] = "ll"
 
@@ -89,7 +167,9 @@ class IDLAutoBase(Directive):
 
     def handle_idl_object_table(self, obj):
         """docstring for handle_idl_object_table"""
-        if obj.kind == "pro":
+        if is_class_definition(obj):
+            signature_line = f":idl:class:`{obj.classname}`"
+        elif obj.kind == "pro":
             signature_line = f":idl:pro:`{obj.name}`"
         elif obj.kind == "function":
             signature_line = f":idl:func:`{obj.name}`"
@@ -102,23 +182,70 @@ class IDLAutoBase(Directive):
     def handle_idl_object(self, obj):
         """docstring for handle_idl_object"""
         tab_width = self.state.document.settings.tab_width
+        if is_class_definition(obj):
+            return self.handle_idl_class(obj)
         if obj.kind == "pro":
             directive_line = f".. idl:pro:: pro {obj.name}, {obj.signature}"
         elif obj.kind == "function":
             directive_line = f".. idl:function:: function {obj.name}, {obj.signature}"
         content_lines = [" "] + obj.docstring.splitlines()
+        if "calls" in self.options:
+            content_lines += ["", f".. idl:callgraph:: {obj.name}"]
         content_lines = [(" " * tab_width) + line for line in content_lines]
         return [directive_line] + content_lines
 
+    def handle_idl_class(self, obj):
+        """Document a ``Class__define`` procedure as the class it defines, with the fields of its structure."""
+        indent = " " * self.state.document.settings.tab_width
+        lines = [f".. idl:class:: {obj.classname}", indent + " "] + [
+            indent + line for line in obj.docstring.splitlines()
+        ]
+        if obj.inherits:
+            lines += [""] + [f"{indent}:inherits: {parent}" for parent in obj.inherits]
+        for member in obj.members:
+            lines += ["", f"{indent}.. idl:member:: {member}"]
+        return lines
+
+    def get_content(self, objects, source):
+        """Get the lines documenting some routines, attributed to their lines in the IDL source file.
+
+        The calls and source lines of each routine are noted in the domain, for call graphs and source pages.
+        """
+        env = self.state.document.settings.env
+        domain = env.get_domain("idl")
+        path = os.path.relpath(os.path.abspath(source), env.srcdir)
+        content = StringList()
+        for obj in objects:
+            fullname = obj.classname if is_class_definition(obj) else obj.name
+            domain.note_calls(obj.name, env.docname, obj.calls)
+            domain.note_source(fullname, env.docname, path, obj.lineno, obj.endline)
+            lines = self.handle_idl_object(obj)
+            ndoc = len(obj.docstring.splitlines())
+            first_comment = obj.lineno - 1 - len(obj.docstring.split("\n")) if obj.docstring else obj.lineno - 1
+            for i, line in enumerate(lines):
+                # Lines are [directive, blank, docstring..., extras...]
+                offset = first_comment + i - 2 if 2 <= i < 2 + ndoc else obj.lineno - 1
+                content.append(line, source, offset)
+        return content
+
+    def insert_content(self, content, source):
+        """Insert generated lines after this directive in a single splice, keeping their source attribution."""
+        input_lines = self.state_machine.input_lines
+        line_offset = self.state_machine.line_offset
+        input_lines.insert(line_offset + 1, "", source="internal padding after " + source, offset=len(content))
+        input_lines.insert(line_offset + 1, "", source="internal padding before " + source, offset=-1)
+        input_lines.insert(line_offset + 2, content)
+
     def get_idl_objects(self, include_file):
-        """docstring for get_idl_objects"""
-        parser = IDLParser()
-        return parser.parse(include_file.readlines())
+        """Get the routines in a file."""
+        return self.state.document.settings.env.get_domain("idl").parse_source(include_file.read())
 
 
 class IDLAutoFile(IDLAutoBase):
     """Automatically handle IDL files which contain functions or programs."""
 
+    option_spec = dict(IDLAutoBase.option_spec, routine=directives.unchanged_required)
+
     def get_lines(self, include_file):
         """Get lines for insertion"""
         newlines = []
@@ -129,16 +256,17 @@ class IDLAutoFile(IDLAutoBase):
     def run(self):
         """Run this directive, loading the source etc."""
         include_file = self.read(self.arguments[0])
-        newlines = []
         nodes = []
         if "summary" in self.options:
             table_spec, table, body = self.get_table()
             nodes += [table_spec, table]
-        for obj in self.get_idl_objects(include_file):
-            newlines += self.handle_idl_object(obj)
-            if "summary" in self.options:
+        objects = self.get_idl_objects(include_file)
+        if "routine" in self.options:
+            objects = [obj for obj in objects if obj.name.lower() == self.options["routine"].lower()]
+        if "summary" in self.options:
+            for obj in objects:
                 body.append(self.get_row(*self.handle_idl_object_table(obj)))
-        self.state_machine.insert_input(newlines, include_file.source_path)
+        self.insert_content(self.get_content(objects, include_file.source_path), include_file.source_path)
         return nodes
 
 
@@ -150,6 +278,7 @@ class IDLAutoPath(IDLAutoBase):
         "absolute": directives.flag,
         "glob": directives.unchanged,
         "summary": directives.flag,
+        "calls": directives.flag,
     }
 
     def get_path(self):
@@ -169,32 +298,29 @@ class IDLAutoPath(IDLAutoBase):
         """Walk a directory and find many files!"""
         path = self.get_path()
         nodes = []
-        body = None
         if "summary" in self.options:
             table_spec, table, body = self.get_table()
             nodes += [table_spec, table]
-            self.options.pop("summary")
-            for file in glob.glob(path):
-                include_file = self.read(file)
-                for obj in self.get_idl_objects(include_file):
+        content = StringList()
+        for file in glob.glob(path):
+            include_file = self.read(file)
+            objects = self.get_idl_objects(include_file)
+            if "summary" in self.options:
+                for obj in objects:
                     body.append(self.get_row(*self.handle_idl_object_table(obj)))
-        for file in reversed(glob.glob(path)):
-            autofile = IDLAutoFile(
-                self.name,
-                [file],  # arguments
-                self.options,
-                [],  # content
-                self.lineno,
-                self.content_offset,
-                self.block_text,
-                self.state,
-                self.state_machine,
-            )
-            nodes += autofile.run()
+            content.extend(self.get_content(objects, include_file.source_path))
+            content.append("", "internal padding after " + include_file.source_path)
+        self.insert_content(content, path)
         return nodes
 
 
 def setup(app):
     """Patch in this directive to the domain."""
+    from .stubs import generate_stubs
+
     app.add_directive_to_domain("idl", "autofile", IDLAutoFile)
     app.add_directive_to_domain("idl", "autopath", IDLAutoPath)
+    app.add_config_value("idl_stubs", {}, "env")
+    app.add_config_value("idl_stub_granularity", "file", "env")
+    app.connect("builder-inited", generate_stubs)
+    return {"parallel_read_safe": True, "parallel_write_safe": True}
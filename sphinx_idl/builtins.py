@@ -0,0 +1,29 @@
+#
+#  builtins.py
+#  sphinx-idl
+#
+#  Names of the routines and classes built into IDL.
+#
+
+__all__ = ["IDL_BUILTINS"]
+
+#: Lower case names of commonly used IDL intrinsic routines and classes, which references resolve to the
+#: external documentation named by ``idl_builtin_url`` unless they are documented in the project.
+IDL_BUILTINS = frozenset(
+    """
+    abs acos alog alog10 arg_present array_equal array_indices asin atan bindgen bytarr byte bytscl call_function
+    call_method call_procedure ceil complex complexarr congrid convol cos cosh create_struct dblarr dcomplex
+    dcomplexarr define_key device dialog_message dialog_pickfile dictionary dindgen dist double execute exp
+    fft file_basename file_copy file_delete file_dirname file_info file_lines file_mkdir file_search file_test
+    file_which findgen finite fix float floor fltarr free_lun fstat get_lun getenv hash heap_free help
+    histogram idl_object imaginary indgen interpol intarr invert isa keyword_set l64indgen lindgen list
+    lon64arr long long64 lonarr make_array max mean median message min moment n_elements n_params n_tags
+    obj_class obj_destroy obj_isa obj_new obj_valid on_error on_ioerror openr openu openw orderedhash plot
+    printf print ptr_free ptr_new ptr_valid ptrarr randomn randomu read readf readu rebin reform
+    replicate reverse round routine_info save restore shift sin sindgen sinh size sort sqrt stddev stop strarr
+    strcmp strcompress string strjoin strlen strlowcase strmatch strmid strpos strsplit strtrim struct_assign
+    strupcase systime tag_names tan tanh temporary total transpose tvscl typename uindgen uint uintarr ulindgen
+    ulong ulong64 ulonarr uniq value_locate where widget_base widget_button widget_control widget_draw
+    widget_event widget_info widget_label widget_text write_png writeu xmanager
+    """.split()
+)
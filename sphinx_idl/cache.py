@@ -0,0 +1,141 @@
+#
+#  cache.py
+#  sphinx-idl
+#
+#  A content-addressed cache of parsed IDL sources.
+#
+"""
+Manage a content-addressed cache of parsed IDL sources.
+
+Run it as ``python -m sphinx_idl.cache prune DIRECTORY --max-size 100M`` to shrink a cache directory.
+"""
+
+import json
+import os
+import sys
+
+from .parser import PARSER_VERSION
+from .utils import atomic_write
+
+__all__ = ["ParseCache", "MemoryCache", "main"]
+
+
+class MemoryCache:
+    """Parsed IDL routines kept in memory by a long running process, stored under the hash of the source."""
+
+    def __init__(self):
+        super().__init__()
+        self.entries = {}
+
+    def get(self, digest):
+        """Get the records for a content hash, or None if they aren't cached."""
+        return self.entries.get(digest)
+
+    def put(self, digest, records):
+        """Store the records for a content hash."""
+        self.entries[digest] = records
+
+    def discard(self, digest):
+        """Forget the records for a content hash."""
+        self.entries.pop(digest, None)
+
+
+class ParseCache:
+    """Parsed IDL routines, stored as records under the hash of the source file contents.
+
+    Entries do not depend on paths or modification times, so a cache directory can be shared between machines and
+    CI jobs. Entries are written atomically, so concurrent builds sharing a directory never see partial entries.
+    """
+
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+
+    def path(self, digest):
+        """The path to the entry for a content hash."""
+        return os.path.join(self.directory, f"v{PARSER_VERSION}", digest[:2], f"{digest}.json")
+
+    def get(self, digest):
+        """Get the records for a content hash, or None if they aren't cached."""
+        path = self.path(digest)
+        try:
+            with open(path, encoding="utf-8") as stream:
+                records = json.load(stream)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark the entry as recently used, for pruning.
+            os.utime(path)
+        except OSError:
+            pass
+        return records
+
+    def put(self, digest, records):
+        """Store the records for a content hash."""
+        try:
+            atomic_write(self.path(digest), json.dumps(records, separators=(",", ":")).encode("utf-8"))
+        except OSError:
+            # The cache is only an optimization, so a read-only or full cache directory is not an error.
+            pass
+
+    def entries(self):
+        """List ``(mtime, size, path)`` for every entry in the cache."""
+        entries = []
+        for dirpath, _dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self, max_size):
+        """Remove the least recently used entries until the cache is no larger than ``max_size`` bytes.
+
+        Returns the number of entries removed.
+        """
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        for _mtime, entry_size, path in entries:
+            if size <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed += 1
+        return removed
+
+
+def parse_size(text):
+    """Parse a size such as ``500K``, ``100M`` or ``2G`` into bytes."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m sphinx_idl.cache", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    prune = commands.add_parser("prune", help="remove least recently used entries")
+    prune.add_argument("directory", help="the cache directory")
+    prune.add_argument("--max-size", type=parse_size, required=True, help="maximum cache size, e.g. 100M")
+    args = parser.parse_args(argv)
+
+    if args.command == "prune":
+        removed = ParseCache(args.directory).prune(args.max_size)
+        print(f"Removed {removed} entries from {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
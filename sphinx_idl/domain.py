@@ -6,22 +6,31 @@
 #  Copyright 2014 Alexander Rudy. All rights reserved.
 #
 
+import os.path
 import re
 
+from docutils import nodes
+from docutils.parsers.rst import Directive
 from sphinx import addnodes
 from sphinx.directives import ObjectDescription
 from sphinx.roles import XRefRole
 from sphinx.domains import Domain, ObjType
-from sphinx.domains.python._object import _pseudo_parse_arglist
 from sphinx.locale import _
+from sphinx.util import logging
 from sphinx.util.docfields import GroupedField, TypedField, Field
 from sphinx.util.nodes import make_refnode
 
-__all__ = ["setup", "IDLDomain", "IDLFunction", "IDLProgram"]
+from .builtins import IDL_BUILTINS
+from .inventory import make_inventory
+from .parser import IDLParser, content_hash
+
+__all__ = ["setup", "IDLDomain", "IDLFunction", "IDLProgram", "IDLClass"]
+
+logger = logging.getLogger(__name__)
 
 idl_sig_re = re.compile(
     r"""^ (?:(pro|function)\s)?     # pro/function specifier
-          ([\w_]*)           # pro/function name
+          ([\w_]*(?:::[\w_]+)?)  # pro/function name, or Class::method
           (?:,?\s*(.*)            # optional: arguments
           )? $                          # and nothing more
           """,
@@ -70,10 +79,11 @@ class IDLObjectBase(ObjectDescription):
                     + self.env.doc2path(inv[fullname][0]),
                     line=self.lineno,
                 )
-            inv[fullname] = (self.env.docname, self.objtype)
+            self.env.get_domain("idl").note_object(fullname, self.env.docname, self.objtype)
 
-        indextext = f"{fullname} ({self.objtype})"
-        self.indexnode["entries"].append(("single", indextext, fullname, "", None))
+        if self.env.config.idl_add_index_entries:
+            indextext = f"{fullname} ({self.objtype})"
+            self.indexnode["entries"].append(("single", indextext, fullname, "", None))
 
     def after_content(self):
         if self.parentname_set:
@@ -140,6 +150,37 @@ class IDLStruct(IDLObjectBase):
             self.parentname_set = True
 
 
+class IDLClass(IDLObjectBase):
+    """Describes an IDL object class, defined by a ``Class__define`` procedure."""
+
+    doc_field_types = [
+        Field("inherits", label=_("Inherits"), has_arg=False, names=("inherits",), bodyrolename="class"),
+    ]
+
+    def handle_signature(self, sig, signode):
+        """Handle class signature."""
+        name = sig.strip()
+        if not re.match(r"^[\w_]+$", name):
+            raise ValueError("Class name must be a single identifier.")
+        signode += addnodes.desc_annotation(self.objtype, self.objtype)
+        signode["fullname"] = name
+        signode += addnodes.desc_name(name, name)
+        return (name, "")
+
+    def before_content(self):
+        IDLObjectBase.before_content(self)
+        if self.names:
+            self.env.temp_data["idl:parent"] = self.names[0][0]
+            self.parentname_set = True
+
+    def transform_content(self, contentnode):
+        if self.names:
+            self.env.get_domain("idl").note_methodlist(self.names[0][0], self.env.docname)
+            node = classmethods("")
+            node["class"] = self.names[0][0]
+            contentnode += node
+
+
 class IDLMember(IDLObjectBase):
     """A member of an IDL structure."""
 
@@ -238,6 +279,8 @@ class IDLObject(IDLObjectBase):
         if not arglist and self.objtype == "function":
             signode += addnodes.desc_parameterlist()
         elif arglist:
+            from sphinx.domains.python._object import _pseudo_parse_arglist
+
             _pseudo_parse_arglist(signode, arglist)
         return (name, "")
 
@@ -266,6 +309,27 @@ class IDLFunction(IDLObject):
     ]
 
 
+class callgraph(nodes.General, nodes.Element):
+    """Placeholder for the calls and callers of a routine, which are only known once all documents are read."""
+
+
+class IDLCallGraph(Directive):
+    """List the routines called by, and calling, an IDL routine."""
+
+    required_arguments = 1
+
+    def run(self):
+        env = self.state.document.settings.env
+        env.get_domain("idl").note_callgraph(self.arguments[0], env.docname)
+        node = callgraph("")
+        node["routine"] = self.arguments[0]
+        return [node]
+
+
+class classmethods(nodes.General, nodes.Element):
+    """Placeholder for the methods of a class, which are only known once all documents are read."""
+
+
 class IDLXRefRole(XRefRole):
 
     def process_link(self, env, refnode, has_explicit_title, title, target):
@@ -294,6 +358,7 @@ class IDLDomain(Domain):
         "pro": ObjType(_("pro"), "pro"),
         "structure": ObjType(_("structure"), "struct"),
         "member": ObjType(_("member"), "member"),
+        "class": ObjType(_("class"), "class"),
     }
 
     directives = {
@@ -301,40 +366,365 @@ class IDLDomain(Domain):
         "pro": IDLProgram,
         "structure": IDLStruct,
         "member": IDLMember,
+        "class": IDLClass,
+        "callgraph": IDLCallGraph,
     }
     roles = {
         "func": IDLXRefRole(),
         "pro": IDLXRefRole(fix_parens=False),
         "struct": IDLXRefRole(fix_parens=False),
         "member": IDLXRefRole(fix_parens=False),
+        "class": IDLXRefRole(fix_parens=False),
     }
 
     initial_data = {
         "objects": {},  # fullname -> docname, objtype
+        "calls": {},  # fullname -> docname, names of called routines
+        "classes": {},  # lowercase class name -> lowercase method name -> fullname, docname
+        "sources": {},  # fullname -> docname, source path, first line, last line
+        "callgraphs": {},  # docname -> routine -> calls and callers as last written
+        "methodlists": {},  # docname -> class name -> methods as last written
     }
+    data_version = 7
 
-    def clear_doc(self, docname):
-        for fullname, (fn, _name) in list(self.data["objects"].items()):
-            if fn == docname:
-                del self.data["objects"][fullname]
+    _callgraph = None
 
-    def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
+    #: References which resolved to no documented object, as ``(parent, target)``, until the objects change.
+    _missing = None
+
+    #: Counts of the unresolved references to each target, reported once at the end of the build.
+    _unresolved = None
+
+    #: Parsed sources kept in memory between builds by long running processes (see :mod:`sphinx_idl.watch`).
+    memory_cache = None
 
-        parent = node.get("idl:parent")
+    def clear_doc(self, docname):
+        self.data["objects"].clear_doc(docname)
+        for fullname, (fn, _calls) in list(self.data["calls"].items()):
+            if fn == docname:
+                del self.data["calls"][fullname]
+        for classname, methods in list(self.data["classes"].items()):
+            for method, (_fullname, fn) in list(methods.items()):
+                if fn == docname:
+                    del methods[method]
+            if not methods:
+                del self.data["classes"][classname]
+        for fullname, (fn, _path, _start, _end) in list(self.data["sources"].items()):
+            if fn == docname:
+                del self.data["sources"][fullname]
+        self.data["callgraphs"].pop(docname, None)
+        self.data["methodlists"].pop(docname, None)
+        self._callgraph = None
+        self._missing = None
+
+    def merge_domaindata(self, docnames, otherdata):
+        self.data["objects"].merge(docnames, otherdata["objects"])
+        for fullname, (fn, calls) in otherdata["calls"].items():
+            if fn in docnames:
+                self.data["calls"][fullname] = (fn, calls)
+        for classname, methods in otherdata["classes"].items():
+            for method, (fullname, fn) in methods.items():
+                if fn in docnames:
+                    self.data["classes"].setdefault(classname, {})[method] = (fullname, fn)
+        for fullname, source in otherdata["sources"].items():
+            if source[0] in docnames:
+                self.data["sources"][fullname] = source
+        for docname, routines in otherdata["callgraphs"].items():
+            if docname in docnames:
+                self.data["callgraphs"][docname] = routines
+        for docname, classes in otherdata["methodlists"].items():
+            if docname in docnames:
+                self.data["methodlists"][docname] = classes
+        self._callgraph = None
+        self._missing = None
+
+    def note_calls(self, fullname, docname, calls):
+        """Record the names of the routines called by a routine, as found in its source."""
+        self.data["calls"][fullname] = (docname, tuple(calls))
+        self._callgraph = None
+
+    def note_callgraph(self, routine, docname):
+        """Record that a document lists the calls and callers of a routine."""
+        self.data["callgraphs"].setdefault(docname, {})[routine] = None
+
+    def get_outdated_callgraphs(self):
+        """Find the documents whose call graph lists changed since they were last written, without being read again.
+
+        Each routine's lists are compared, with the documents they link to, to those recorded the last time.
+        """
+        calls, callers = self.get_callgraph()
+        objects = self.data["objects"]
+        outdated = set()
+        for docname, routines in self.data["callgraphs"].items():
+            for routine, state in routines.items():
+                current = tuple(
+                    tuple((name, objects[name][0]) for name in sorted(names.get(routine, [])))
+                    for names in (calls, callers)
+                )
+                if current != state:
+                    routines[routine] = current
+                    outdated.add(docname)
+        return outdated
+
+    def note_methodlist(self, classname, docname):
+        """Record that a document lists the methods of a class."""
+        self.data["methodlists"].setdefault(docname, {})[classname] = None
+
+    def get_outdated_methodlists(self):
+        """Find the documents whose class method lists changed since they were last written, without being read
+        again."""
+        outdated = set()
+        for docname, classes in self.data["methodlists"].items():
+            for classname, state in classes.items():
+                current = tuple(self.get_methods(classname))
+                if current != state:
+                    classes[classname] = current
+                    outdated.add(docname)
+        return outdated
+
+    def note_source(self, fullname, docname, path, start, end):
+        """Record the source file and lines of a documented routine, with the path relative to the source
+        directory."""
+        self.data["sources"][fullname] = (docname, path, start, end)
+
+    def note_object(self, fullname, docname, objtype):
+        """Record a described object."""
+        self.data["objects"][fullname] = (docname, objtype)
+        if "::" in fullname:
+            self.note_method(fullname, docname)
+        self._missing = None
+
+    def note_method(self, fullname, docname):
+        """Record a documented ``Class::method`` in the index of class methods."""
+        classname, method = fullname.split("::", 1)
+        self.data["classes"].setdefault(classname.lower(), {})[method.lower()] = (fullname, docname)
+        self._missing = None
+
+    def get_methods(self, classname):
+        """The documented methods of a class, as ``(fullname, docname)`` pairs sorted by name."""
+        return sorted(self.data["classes"].get(classname.lower(), {}).values())
+
+    def find_method(self, target):
+        """Find a documented ``Class::method``, ignoring case like IDL, returning ``(fullname, docname)`` or None."""
+        classname, _sep, method = target.partition("::")
+        return self.data["classes"].get(classname.lower(), {}).get(method.lower())
+
+    def get_callgraph(self):
+        """Match recorded calls to documented routines, returning ``(calls, callers)`` adjacency maps."""
+        if self._callgraph is None:
+            objects = self.data["objects"]
+            routines = {}
+            for fullname, (_docname, objtype) in objects.items():
+                if objtype in ("pro", "function"):
+                    routines[fullname.lower()] = fullname
+            calls, callers = {}, {}
+            for caller, (_docname, names) in self.data["calls"].items():
+                if caller not in objects:
+                    continue
+                calls[caller] = [routines[name.lower()] for name in names if name.lower() in routines]
+                for callee in calls[caller]:
+                    callers.setdefault(callee, []).append(caller)
+            self._callgraph = calls, callers
+        return self._callgraph
+
+    def find_object(self, parent, target):
+        """Find the documented object a reference points to, returning ``(fullname, docname)`` or None.
+
+        Targets which aren't found are remembered until the documented objects change, so repeated references to
+        undocumented routines (usually IDL built-ins) are answered by a single set lookup.
+        """
+        if self._missing is None:
+            self._missing = set()
+        elif (parent, target) in self._missing:
+            return None
+        objects = self.data["objects"]
         if parent:
             ptarget = parent + "." + target
-        if parent and (ptarget in self.data["objects"]):
-            obj = self.data["objects"][ptarget]
-            return make_refnode(builder, fromdocname, obj[0], ptarget, contnode, ptarget)
-        elif target in self.data["objects"]:
-            obj = self.data["objects"][target]
-            return make_refnode(builder, fromdocname, obj[0], target, contnode, target)
+            obj = objects.get(ptarget)
+            if obj is not None:
+                return ptarget, obj[0]
+        obj = objects.get(target)
+        if obj is not None:
+            return target, obj[0]
+        if "::" in target:
+            method = self.find_method(target)
+            if method is not None:
+                return method
+        self._missing.add((parent, target))
         return None
 
+    def resolve_builtin(self, env, typ, target, contnode):
+        """Link a reference to an IDL built-in routine or class to its external documentation, if configured."""
+        url = env.config.idl_builtin_url
+        if not url or typ not in ("func", "pro", "class"):
+            return None
+        builtins = env.config.idl_builtins
+        name = target.lower()
+        if name not in (IDL_BUILTINS if builtins is None else builtins):
+            return None
+        refuri = url.format(name=name, upper=name.upper())
+        return nodes.reference("", "", contnode, internal=False, refuri=refuri, reftitle=_("(in IDL)"))
+
+    def resolve_xref(self, env, fromdocname, builder, typ, target, node, contnode):
+        found = self.find_object(node.get("idl:parent"), target)
+        if found is None:
+            return self.resolve_builtin(env, typ, target, contnode)
+        fullname, docname = found
+        return make_refnode(builder, fromdocname, docname, fullname, contnode, fullname)
+
+    def note_unresolved(self, target):
+        """Count an unresolved reference, to be reported with the others at the end of the build."""
+        if self._unresolved is None:
+            self._unresolved = {}
+        self._unresolved[target] = self._unresolved.get(target, 0) + 1
+
+    def report_unresolved(self):
+        """Emit one warning summarizing the unresolved references counted so far, then forget them."""
+        unresolved, self._unresolved = self._unresolved, None
+        if not unresolved:
+            return
+        counts = sorted(unresolved.items(), key=lambda item: (-item[1], item[0]))
+        shown = ", ".join(f"{target} ({count})" for target, count in counts[:20])
+        if len(counts) > 20:
+            shown += ", ..."
+        logger.warning(
+            "%d unresolved IDL references to %d targets: %s",
+            sum(unresolved.values()),
+            len(counts),
+            shown,
+            type="ref",
+            subtype="idl",
+        )
+
     def get_objects(self):
         for refname, (docname, type) in self.data["objects"].items():
             yield (refname, refname, type, docname, refname, 1)
 
+    @property
+    def symbol_index(self):
+        """The prebuilt symbol database named by ``idl_symbol_index``, if any."""
+        path = self.env.config.idl_symbol_index
+        if not path:
+            return None
+        path = os.path.join(self.env.srcdir, path)
+        if not os.path.exists(path):
+            return None
+        from .index import SymbolIndex
+
+        return SymbolIndex.cached(path)
+
+    @property
+    def parse_cache(self):
+        """The parse cache in the ``idl_parse_cache`` directory, if any."""
+        directory = self.env.config.idl_parse_cache
+        if not directory:
+            return None
+        from .cache import ParseCache
+
+        return ParseCache(os.path.join(self.env.srcdir, directory))
+
+    def parse_source(self, text):
+        """Parse the routines in IDL source text, using parse results kept in memory, the symbol index or the parse
+        cache when possible."""
+        parser = IDLParser()
+        memory, index, cache = self.memory_cache, self.symbol_index, self.parse_cache
+        if memory is None and index is None and cache is None:
+            return list(parser.parse(text.splitlines(True)))
+
+        digest = content_hash(text)
+        records = memory.get(digest) if memory is not None else None
+        if records is None and index is not None:
+            records = index.lookup(digest)
+        if records is None and cache is not None:
+            records = cache.get(digest)
+            if records is None:
+                records = [parser.dump(obj) for obj in parser.parse(text.splitlines(True))]
+                cache.put(digest, records)
+        if records is None:
+            records = [parser.dump(obj) for obj in parser.parse(text.splitlines(True))]
+        if memory is not None:
+            memory.put(digest, records)
+        return [parser.load(record) for record in records]
+
+
+def process_callgraph_nodes(app, doctree, fromdocname):
+    """Replace call graph placeholders with links to the calling and called routines."""
+    domain = app.env.get_domain("idl")
+    calls, callers = domain.get_callgraph()
+    for node in list(doctree.findall(callgraph)):
+        routine = node["routine"]
+        fields = nodes.field_list()
+        for label, names in ((_("Calls"), calls.get(routine, [])), (_("Called by"), callers.get(routine, []))):
+            if not names:
+                continue
+            paragraph = nodes.paragraph()
+            for name in sorted(names):
+                if len(paragraph):
+                    paragraph += nodes.Text(", ")
+                docname = domain.data["objects"][name][0]
+                contnode = nodes.literal(name, name, classes=["xref", "idl"])
+                paragraph += make_refnode(app.builder, fromdocname, docname, name, contnode, name)
+            fields += nodes.field("", nodes.field_name(label, label), nodes.field_body("", paragraph))
+        node.replace_self([fields] if len(fields) else [])
+
+
+def process_classmethods_nodes(app, doctree, fromdocname):
+    """Replace class method placeholders with links to the documented methods of each class."""
+    domain = app.env.get_domain("idl")
+    for node in list(doctree.findall(classmethods)):
+        methods = domain.get_methods(node["class"])
+        if not methods:
+            node.replace_self([])
+            continue
+        paragraph = nodes.paragraph()
+        for fullname, docname in methods:
+            if len(paragraph):
+                paragraph += nodes.Text(", ")
+            contnode = nodes.literal(fullname, fullname, classes=["xref", "idl"])
+            paragraph += make_refnode(app.builder, fromdocname, docname, fullname, contnode, fullname)
+        label = _("Methods")
+        field = nodes.field("", nodes.field_name(label, label), nodes.field_body("", paragraph))
+        node.replace_self([nodes.field_list("", field)])
+
+
+def warn_missing_reference(app, domain, node):
+    """Count unresolved IDL references instead of warning about each one."""
+    if domain is None or domain.name != "idl":
+        return None
+    domain.note_unresolved(node["reftarget"])
+    return True
+
+
+def report_unresolved(app, exception):
+    """Summarize the unresolved IDL references of the build in a single warning."""
+    if exception is None:
+        app.env.get_domain("idl").report_unresolved()
+
+
+def find_updated_docs(app, env):
+    """Rewrite documents whose generated link lists changed because other documents changed."""
+    domain = env.get_domain("idl")
+    return sorted(domain.get_outdated_callgraphs() | domain.get_outdated_methodlists())
+
+
+def setup_inventory(app):
+    """Switch the domain inventory to the configured backend."""
+    domain = app.env.get_domain("idl")
+    domain.data["objects"] = make_inventory(app.config.idl_inventory, domain.data["objects"], app.env)
+
 
 def setup(app):
     app.add_domain(IDLDomain)
+    app.connect("builder-inited", setup_inventory)
+    app.connect("doctree-resolved", process_callgraph_nodes)
+    app.connect("env-get-updated", find_updated_docs)
+    app.connect("doctree-resolved", process_classmethods_nodes)
+    app.connect("warn-missing-reference", warn_missing_reference)
+    app.connect("build-finished", report_unresolved)
+    app.add_config_value("idl_symbol_index", None, "env")
+    app.add_config_value("idl_inventory", "memory", "env")
+    app.add_config_value("idl_parse_cache", None, "")
+    app.add_config_value("idl_add_index_entries", True, "env")
+    app.add_config_value("idl_builtin_url", None, "env")
+    app.add_config_value("idl_builtins", None, "env")
+    return {"env_version": 1, "parallel_read_safe": True, "parallel_write_safe": True}
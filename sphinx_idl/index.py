@@ -0,0 +1,154 @@
+#
+#  index.py
+#  sphinx-idl
+#
+#  Pre-index IDL source trees into a reusable symbol database.
+#
+"""
+Build a symbol database for a tree of IDL sources, which the ``idl`` domain can load instead of parsing.
+
+Run it as ``python -m sphinx_idl.index [-o idl-index.json] [-j N] path [path ...]``. An existing database is
+updated incrementally: only files whose contents changed are parsed again.
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+
+from .parser import IDLParser, PARSER_VERSION, content_hash
+from .utils import atomic_write
+
+__all__ = ["SymbolIndex", "main"]
+
+#: Version of the on-disk database layout.
+INDEX_VERSION = 1
+
+
+def _read_source(path, encoding):
+    """Read an IDL source file."""
+    with open(path, encoding=encoding) as stream:
+        return stream.read()
+
+
+def _index_source(path, encoding):
+    """Parse one file, returning its path, content hash and symbol records."""
+    text = _read_source(path, encoding)
+    parser = IDLParser()
+    symbols = [parser.dump(obj) for obj in parser.parse(text.splitlines(True))]
+    return path, content_hash(text), symbols
+
+
+class SymbolIndex:
+    """A database of the routines found in a set of IDL source files.
+
+    Files are recorded by path, along with the hash of their contents, and symbols are stored as the compact
+    records produced by :meth:`IDLParser.dump`. Lookups are done by content hash, so that the database does not
+    depend on where the sources are checked out.
+    """
+
+    _loaded = {}
+    _loaded_lock = threading.Lock()
+
+    def __init__(self, files=None):
+        super().__init__()
+        self.files = dict(files or {})
+        self._by_hash = None
+
+    @classmethod
+    def load(cls, path):
+        """Load a database from disk."""
+        with open(path, encoding="utf-8") as stream:
+            data = json.load(stream)
+        if data.get("version") != INDEX_VERSION or data.get("parser") != PARSER_VERSION:
+            return cls()
+        return cls(data["files"])
+
+    @classmethod
+    def cached(cls, path):
+        """Load a database from disk, re-using an already loaded copy if the file hasn't changed."""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with cls._loaded_lock:
+            index = cls._loaded.get(key)
+            if index is None:
+                index = cls._loaded[key] = cls.load(path)
+        return index
+
+    def save(self, path):
+        """Write the database to disk."""
+        data = {"version": INDEX_VERSION, "parser": PARSER_VERSION, "files": self.files}
+        atomic_write(path, json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+
+    def lookup(self, digest):
+        """Get the symbol records for a file with the given content hash, or None if it isn't indexed."""
+        by_hash = self._by_hash
+        if by_hash is None:
+            by_hash = self._by_hash = {entry["hash"]: entry["symbols"] for entry in self.files.values()}
+        return by_hash.get(digest)
+
+    def update(self, paths, encoding="utf-8", jobs=1):
+        """Bring the database up to date with a set of files.
+
+        Returns the number of files which had to be parsed.
+        """
+        stale = []
+        for path in paths:
+            entry = self.files.get(path)
+            if entry is None or entry["hash"] != content_hash(_read_source(path, encoding)):
+                stale.append(path)
+        for path in set(self.files) - set(paths):
+            del self.files[path]
+
+        if jobs > 1 and len(stale) > 1:
+            import concurrent.futures
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_index_source, stale, [encoding] * len(stale)))
+        else:
+            results = [_index_source(path, encoding) for path in stale]
+
+        for path, digest, symbols in results:
+            self.files[path] = {"hash": digest, "symbols": symbols}
+        self._by_hash = None
+        return len(results)
+
+
+def find_sources(paths, pattern="*.pro"):
+    """Find IDL source files, recursing into directories."""
+    sources = set()
+    for path in paths:
+        if os.path.isdir(path):
+            sources.update(glob.glob(os.path.join(path, "**", pattern), recursive=True))
+        else:
+            sources.add(path)
+    return sorted(os.path.normpath(source) for source in sources)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m sphinx_idl.index", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="IDL source files or directories to index")
+    parser.add_argument("-o", "--output", default="idl-index.json", help="symbol database to write (and update)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of parallel workers")
+    parser.add_argument("--glob", default="*.pro", help="pattern for source files inside directories")
+    parser.add_argument("--encoding", default="utf-8", help="encoding of the IDL source files")
+    parser.add_argument("--rebuild", action="store_true", help="ignore any existing database")
+    args = parser.parse_args(argv)
+
+    index = SymbolIndex()
+    if not args.rebuild and os.path.exists(args.output):
+        index = SymbolIndex.load(args.output)
+
+    sources = find_sources(args.paths, args.glob)
+    parsed = index.update(sources, encoding=args.encoding, jobs=args.jobs)
+    index.save(args.output)
+    print(f"Indexed {len(sources)} files ({parsed} parsed) into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
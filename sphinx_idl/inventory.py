@@ -0,0 +1,286 @@
+#
+#  inventory.py
+#  sphinx-idl
+#
+#  Storage backends for the objects known to the IDL domain.
+#
+
+import os
+import threading
+
+__all__ = ["CompactInventory", "SQLiteInventory", "make_inventory"]
+
+
+class CompactInventory:
+    """The default inventory, mapping full names to ``(docname, objtype)`` in memory.
+
+    Docnames and object types are interned in tables, and each object is stored as a single integer indexing both
+    tables, so that the inventory pickles small and loads quickly even with many objects per document.
+    """
+
+    #: Bits of each record used for the object type index.
+    objtype_bits = 8
+
+    def __init__(self):
+        super().__init__()
+        self.docnames = []
+        self.objtypes = []
+        self.records = {}
+        self._docname_codes = {}
+        self._objtype_codes = {}
+
+    def __getstate__(self):
+        return {"docnames": self.docnames, "objtypes": self.objtypes, "records": self.records}
+
+    def __setstate__(self, state):
+        self.docnames = state["docnames"]
+        self.objtypes = state["objtypes"]
+        self.records = state["records"]
+        self._docname_codes = {docname: code for code, docname in enumerate(self.docnames)}
+        self._objtype_codes = {objtype: code for code, objtype in enumerate(self.objtypes)}
+
+    def _intern(self, table, codes, value):
+        """Get the code for a value in a table, adding it if required."""
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def _decode(self, record):
+        return self.docnames[record >> self.objtype_bits], self.objtypes[record & ((1 << self.objtype_bits) - 1)]
+
+    def __contains__(self, fullname):
+        return fullname in self.records
+
+    def __getitem__(self, fullname):
+        return self._decode(self.records[fullname])
+
+    def get(self, fullname, default=None):
+        record = self.records.get(fullname)
+        return default if record is None else self._decode(record)
+
+    def __setitem__(self, fullname, value):
+        docname, objtype = value
+        docname_code = self._intern(self.docnames, self._docname_codes, docname)
+        objtype_code = self._intern(self.objtypes, self._objtype_codes, objtype)
+        self.records[fullname] = (docname_code << self.objtype_bits) | objtype_code
+
+    def __delitem__(self, fullname):
+        del self.records[fullname]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def items(self):
+        for fullname, record in self.records.items():
+            yield fullname, self._decode(record)
+
+    def by_objtype(self, objtype):
+        """Iterate over the full names of objects of one type."""
+        code = self._objtype_codes.get(objtype)
+        mask = (1 << self.objtype_bits) - 1
+        for fullname, record in self.records.items():
+            if record & mask == code:
+                yield fullname
+
+    def clear_doc(self, docname):
+        """Remove all objects described in a document."""
+        code = self._docname_codes.get(docname)
+        if code is None:
+            return
+        for fullname, record in list(self.records.items()):
+            if record >> self.objtype_bits == code:
+                del self.records[fullname]
+
+    def merge(self, docnames, other):
+        """Merge in the objects from another inventory which were described in some documents."""
+        for fullname, (fn, objtype) in other.items():
+            if fn in docnames:
+                self[fullname] = (fn, objtype)
+
+
+class SQLiteInventory:
+    """An inventory stored in an SQLite database, for very large IDL domains.
+
+    Only the path to the database is pickled with the environment, and lookups are answered by indexed queries,
+    so loading and saving the environment does not depend on the number of objects.
+
+    Only the process which created the inventory writes to the database. Forked parallel readers keep the objects
+    they add in memory and send them back with their environment, to be written by :meth:`merge`, because a write
+    transaction held by one reader would make all the others wait for it to finish.
+    """
+
+    def __init__(self, path, pending=None):
+        super().__init__()
+        self.path = path
+        self.pending = pending or {}
+        self._owner = os.getpid()
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        self.commit()
+        return {"path": self.path, "pending": self.pending}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state.get("pending"))
+
+    @property
+    def is_worker(self):
+        """Whether this is a copy of the inventory in a forked worker process, which doesn't write the database."""
+        return self._owner != os.getpid()
+
+    @property
+    def connection(self):
+        """A connection to the database, opened on first use (and again in forked worker processes).
+
+        The connection is shared by all the threads of a process.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            with self._lock:
+                if self._connection is None or self._pid != os.getpid():
+                    self._connection = self._connect()
+                    self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self):
+        """Open the database, creating its tables if required."""
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                name TEXT PRIMARY KEY,
+                docname TEXT NOT NULL,
+                objtype TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS objects_docname ON objects (docname);
+            CREATE INDEX IF NOT EXISTS objects_objtype ON objects (objtype);
+            """
+        )
+        return connection
+
+    def commit(self):
+        """Commit pending changes, so that they are visible to other processes."""
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.commit()
+
+    def reset(self):
+        """Remove all objects."""
+        self.connection.execute("DELETE FROM objects")
+        self.commit()
+
+    def __contains__(self, fullname):
+        if fullname in self.pending:
+            return True
+        return self.connection.execute("SELECT 1 FROM objects WHERE name = ?", (fullname,)).fetchone() is not None
+
+    def __getitem__(self, fullname):
+        if fullname in self.pending:
+            return self.pending[fullname]
+        row = self.connection.execute("SELECT docname, objtype FROM objects WHERE name = ?", (fullname,)).fetchone()
+        if row is None:
+            raise KeyError(fullname)
+        return row
+
+    def get(self, fullname, default=None):
+        try:
+            return self[fullname]
+        except KeyError:
+            return default
+
+    def __setitem__(self, fullname, value):
+        docname, objtype = value
+        if self.is_worker:
+            self.pending[fullname] = (docname, objtype)
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO objects (name, docname, objtype) VALUES (?, ?, ?)", (fullname, docname, objtype)
+        )
+
+    def __delitem__(self, fullname):
+        if self.is_worker:
+            del self.pending[fullname]
+            return
+        self.connection.execute("DELETE FROM objects WHERE name = ?", (fullname,))
+
+    def __len__(self):
+        if self.pending:
+            return sum(1 for _fullname in self)
+        return self.connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def __iter__(self):
+        for fullname, _value in self.items():
+            yield fullname
+
+    def items(self):
+        yield from self.pending.items()
+        for fullname, docname, objtype in self.connection.execute("SELECT name, docname, objtype FROM objects"):
+            if fullname not in self.pending:
+                yield fullname, (docname, objtype)
+
+    def by_objtype(self, objtype):
+        """Iterate over the full names of objects of one type."""
+        for fullname, (_docname, type_) in self.pending.items():
+            if type_ == objtype:
+                yield fullname
+        for (fullname,) in self.connection.execute("SELECT name FROM objects WHERE objtype = ?", (objtype,)):
+            if fullname not in self.pending:
+                yield fullname
+
+    def clear_doc(self, docname):
+        """Remove all objects described in a document.
+
+        Sphinx clears outdated documents just before forking parallel readers, so the deletion is committed right
+        away: an open write transaction here would lock out every worker.
+        """
+        for fullname, (fn, _objtype) in list(self.pending.items()):
+            if fn == docname:
+                del self.pending[fullname]
+        if not self.is_worker:
+            self.connection.execute("DELETE FROM objects WHERE docname = ?", (docname,))
+            self.commit()
+
+    def merge(self, docnames, other):
+        """Merge in the objects from another inventory which were described in some documents."""
+        if isinstance(other, SQLiteInventory) and os.path.abspath(other.path) == os.path.abspath(self.path):
+            # Objects from the database itself are already there, only those a worker kept in memory are new.
+            objects = other.pending.items()
+        else:
+            objects = other.items()
+        rows = [(fullname, fn, objtype) for fullname, (fn, objtype) in objects if fn in docnames]
+        if self.is_worker:
+            self.pending.update((fullname, (fn, objtype)) for fullname, fn, objtype in rows)
+            return
+        self.connection.executemany("INSERT OR REPLACE INTO objects (name, docname, objtype) VALUES (?, ?, ?)", rows)
+        self.commit()
+
+
+def make_inventory(backend, objects, env):
+    """Get an inventory for the configured backend, converting the existing ``objects`` if required."""
+    if backend == "sqlite":
+        path = os.path.join(env.doctreedir, "idl-objects.sqlite")
+        if isinstance(objects, SQLiteInventory) and os.path.abspath(objects.path) == os.path.abspath(path):
+            return objects
+        inventory = SQLiteInventory(path)
+        inventory.reset()
+    elif backend == "memory":
+        if isinstance(objects, CompactInventory):
+            return objects
+        inventory = CompactInventory()
+    else:
+        raise ValueError(f"Unknown IDL inventory backend {backend!r}, expected 'memory' or 'sqlite'")
+    for fullname, value in objects.items():
+        inventory[fullname] = value
+    if hasattr(inventory, "commit"):
+        inventory.commit()
+    return inventory
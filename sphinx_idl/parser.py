@@ -8,10 +8,37 @@
 
 import re
 import abc
+import hashlib
 
 
 CompiledRE = type(re.compile(""))
 
+#: Bump this whenever the parser output changes, so that stored parse results are invalidated.
+PARSER_VERSION = 4
+
+#: IDL reserved words, which look like routine calls to the patterns in :class:`IDLSource`.
+RESERVED_WORDS = frozenset(
+    """
+    and begin break case common compile_opt continue do else end endcase endelse endfor endforeach endif endrep
+    endswitch endwhile eq for foreach forward_function function ge goto gt if inherits le lt mod ne not of on_ioerror
+    or pro repeat return switch then until while xor
+    """.split()
+)
+
+
+def routine_class(name):
+    """The class a routine belongs to: ``Class`` for ``Class::method`` or ``Class__define``, otherwise None."""
+    if "::" in name:
+        return name.split("::", 1)[0]
+    if name.lower().endswith("__define") and len(name) > len("__define"):
+        return name[: -len("__define")]
+    return None
+
+
+def content_hash(text):
+    """Return the SHA-256 hex digest identifying a source file's contents."""
+    return hashlib.sha256(text.encode("utf-8", "surrogateescape")).hexdigest()
+
 
 class IDLSourceLine(metaclass=abc.ABCMeta):
     """A single line of IDL source"""
@@ -67,6 +94,7 @@ class IDLFunction(IDLSourceLine):
         match = self.pattern.search(line)
         self.name = match.group(1)
         self.signature = line[len(match.group(0)) :].strip("\r\n")
+        self.classname = routine_class(self.name)
 
 
 class IDLProgram(IDLSourceLine):
@@ -86,6 +114,7 @@ class IDLProgram(IDLSourceLine):
         match = self.pattern.search(line)
         self.name = match.group(1)
         self.signature = line[len(match.group(0)) :].strip("\r\n")
+        self.classname = routine_class(self.name)
 
 
 class IDLSource(IDLSourceLine):
@@ -94,27 +123,80 @@ class IDLSource(IDLSourceLine):
 
     pattern = None
 
+    strings = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+    procedure_call = re.compile(
+        r"""^\s*(?:\w+\s*:\s*)?          # optional label
+        (?:.*\b(?:then|else|do)\s+)?     # optional control statement
+        (?:begin\s+)?
+        ([a-z_][\w$]*(?:::\w+)?)         # procedure name
+        \s*(?:,|$)""",
+        re.IGNORECASE | re.VERBOSE,
+    )
+
+    function_call = re.compile(r"(?<![\w.>$!])([a-z_][\w$]*(?:::\w+)?)\s*\(", re.IGNORECASE)
+
+    structure_definition = re.compile(r"\{\s*([a-z_]\w*)\s*(,.*)?\}", re.IGNORECASE)
+
+    structure_field = re.compile(r",\s*(?:inherits\s+([a-z_]\w*)|([a-z_]\w*)\s*:)", re.IGNORECASE)
+
     def parse(self, line):
         """Parse source lines."""
         self.source = line
 
+    def calls(self):
+        """Names of the routines which might be called from this line.
+
+        Function calls can't be told apart from array subscripts here, so callers should check the names against
+        the routines they know about.
+        """
+        code = self.strings.sub("''", self.source).split(";", 1)[0]
+        names = []
+        for statement in code.split("&"):
+            match = self.procedure_call.match(statement)
+            if match:
+                names.append(match.group(1))
+            names.extend(self.function_call.findall(statement))
+        return [name for name in names if name.lower() not in RESERVED_WORDS]
+
+    def structure(self):
+        """The named structure defined on this line, as ``(name, fields, inherited structures)``, or None."""
+        code = self.strings.sub("''", self.source).split(";", 1)[0]
+        match = self.structure_definition.search(code)
+        if not match:
+            return None
+        fields, inherits = [], []
+        for parent, field in self.structure_field.findall(match.group(2) or ""):
+            if parent:
+                inherits.append(parent)
+            else:
+                fields.append(field)
+        return match.group(1), fields, inherits
+
 
 class IDLParser:
-    """A **very simple** IDL source file parser."""
+    """A **very simple** IDL source file parser.
 
-    line_patterns = [IDLComment, IDLFunction, IDLProgram, IDLSource]
+    Parsers keep no state between calls, and all patterns are compiled once, so a parser (or the routines it
+    returns) can be used from many threads at once.
+    """
+
+    line_patterns = (IDLComment, IDLFunction, IDLProgram, IDLSource)
+
+    continue_line = re.compile(r"\$[\n\r]*$")
 
     def __init__(self):
         super().__init__()
 
     def continue_lines(self, lines):
-        """Handle source continuation."""
-        continue_line = re.compile(r"\$[\n\r]*$")
-        lineiter = iter(lines)
-        for line in lineiter:
-            while continue_line.search(line):
-                line = line.rstrip("$\n\r") + lineiter.__next__()
-            yield line
+        """Handle source continuation, yielding the first and last line numbers with each logical line."""
+        lineiter = enumerate(lines, start=1)
+        for lineno, line in lineiter:
+            endlineno = lineno
+            while self.continue_line.search(line):
+                endlineno, next_line = lineiter.__next__()
+                line = line.rstrip("$\n\r") + next_line
+            yield lineno, endlineno, line
 
     def parse_single(self, line):
         """Parse a single source line."""
@@ -123,16 +205,70 @@ class IDLParser:
                 return linecls(line)
 
     def parse(self, lines):
-        """Parse many lines, emitting containers as we go."""
+        """Parse many lines, emitting each routine once its body has been scanned for calls.
+
+        Each routine records the line it is defined on (``lineno``) and the last line of code in its body
+        (``endline``), not counting comments which follow it.
+        """
         comments = []
-        for line in self.continue_lines(lines):
+        routine = None
+        for lineno, endlineno, line in self.continue_lines(lines):
             obj = self.parse_single(line)
 
             if obj.kind == "function" or obj.kind == "pro":
+                if routine is not None:
+                    yield routine
                 obj.docstring = "\n".join(comment.contents for comment in comments)
-                yield obj
+                obj.lineno = lineno
+                obj.endline = endlineno
+                obj.calls = []
+                obj.members = []
+                obj.inherits = []
+                routine = obj
+            elif obj.kind == "source" and routine is not None:
+                if line.strip():
+                    routine.endline = endlineno
+                for name in obj.calls():
+                    if name.lower() not in (call.lower() for call in routine.calls):
+                        routine.calls.append(name)
+                if routine.classname is not None and routine.name.lower().endswith("__define"):
+                    structure = obj.structure()
+                    if structure is not None and structure[0].lower() == routine.classname.lower():
+                        _name, routine.members, routine.inherits = structure
 
             if obj.kind == "comment":
                 comments.append(obj)
             else:
                 comments = []
+
+        if routine is not None:
+            yield routine
+
+    def dump(self, obj):
+        """Convert a parsed routine into a plain, serializable record."""
+        return [
+            obj.name,
+            obj.kind,
+            obj.signature,
+            obj.docstring,
+            obj.lineno,
+            obj.endline,
+            obj.calls,
+            obj.members,
+            obj.inherits,
+        ]
+
+    def load(self, record):
+        """Rebuild a parsed routine from a record produced by :meth:`dump`.
+
+        Records may be shared between threads by the caches, so the routine gets its own copies of their lists.
+        """
+        name, kind, signature, docstring, lineno, endline, calls, members, inherits = record
+        obj = self.parse_single(f"{kind} {name}, {signature}")
+        obj.docstring = docstring
+        obj.lineno = lineno
+        obj.endline = endline
+        obj.calls = list(calls)
+        obj.members = list(members)
+        obj.inherits = list(inherits)
+        return obj
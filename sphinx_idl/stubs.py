@@ -0,0 +1,155 @@
+#
+#  stubs.py
+#  sphinx-idl
+#
+#  Generate one document per IDL file or routine.
+#
+
+import glob
+import json
+import os
+import re
+
+from sphinx.util import logging
+
+from .parser import IDLParser, content_hash
+
+__all__ = ["generate_stubs"]
+
+logger = logging.getLogger(__name__)
+
+#: The first line of every generated stub, used to recognize stubs and record the hash of what they document.
+STUB_MARKER = ".. sphinx-idl-stub:"
+
+
+def stub_name(name):
+    """Make a routine name safe to use as a file name."""
+    return re.sub(r"[^\w.-]", "_", name.replace("::", "."))
+
+
+def render_stub(title, directive, digest, options=()):
+    """Render the text of a stub document."""
+    lines = [f"{STUB_MARKER} {digest}", "", title, "=" * len(title), "", directive]
+    lines += [f"   :{option}: {value}".rstrip() for option, value in options]
+    return "\n".join(lines) + "\n"
+
+
+def render_index(title, docnames):
+    """Render the text of the index document listing a set of stubs."""
+    lines = [f"{STUB_MARKER} index", "", title, "=" * len(title), "", ".. toctree::", "   :maxdepth: 1", ""]
+    lines += [f"   {docname}" for docname in docnames]
+    return "\n".join(lines) + "\n"
+
+
+def write_stub(path, text):
+    """Write a stub, returning True if its contents changed."""
+    try:
+        with open(path, encoding="utf-8") as stream:
+            if stream.read() == text:
+                return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as stream:
+        stream.write(text)
+    return True
+
+
+def find_stubs(directory):
+    """Find the stubs previously generated in a directory."""
+    stubs = set()
+    for path in glob.glob(os.path.join(directory, "**", "*.rst"), recursive=True):
+        with open(path, encoding="utf-8") as stream:
+            if stream.readline().startswith(STUB_MARKER):
+                stubs.add(os.path.normpath(path))
+    return stubs
+
+
+def glob_root(pattern):
+    """The directory searched by a glob pattern: the part of the pattern before its first wildcard."""
+    parts = pattern.split(os.sep)
+    for i, part in enumerate(parts):
+        if re.search(r"[*?[]", part):
+            return os.sep.join(parts[:i])
+    return os.path.dirname(pattern)
+
+
+def stub_docname(relpath, name=None):
+    """The document name of the stub for a file (given relative to the directory searched), or for a routine in it."""
+    directory, filename = os.path.split(os.path.splitext(relpath)[0])
+    docname = os.path.join(directory, stub_name(name) if name is not None else filename).replace(os.sep, "/")
+    # The index of the stubs is generated as "index".
+    return docname + "_" if docname == "index" else docname
+
+
+def generate_stubs(app):
+    """Write one stub document per IDL file (or routine) for each directory in ``idl_stubs``.
+
+    Stubs are named after the path of each file relative to the directory searched, so that files with the same
+    name in different directories get separate stubs. Stubs are only rewritten when the hash of what they document
+    changes, so unchanged stubs don't trigger a rebuild, and each stub can be read by a separate parallel worker.
+    """
+    granularity = app.config.idl_stub_granularity
+    if granularity not in ("file", "routine"):
+        logger.warning("idl_stub_granularity must be 'file' or 'routine', not %r", granularity)
+        return
+
+    domain = app.env.get_domain("idl")
+    encoding = app.config.source_encoding
+    for output, source in app.config.idl_stubs.items():
+        directory = os.path.join(app.srcdir, output)
+        pattern = os.path.join(app.srcdir, source)
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.pro")
+        root = glob_root(pattern)
+
+        stubs, origins, written = {}, {}, 0
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                with open(path, encoding=encoding) as stream:
+                    text = stream.read()
+            except (OSError, UnicodeError) as error:
+                logger.warning("[idl] skipping stub for %s: %s", path, error)
+                continue
+            # The directive reads paths relative to the working directory, which need not be the source directory.
+            abspath = os.path.abspath(path)
+            relpath = os.path.relpath(path, root)
+            if granularity == "file":
+                title = os.path.splitext(relpath)[0].replace(os.sep, "/")
+                entries = [(stub_docname(relpath), title, content_hash(text), [])]
+            else:
+                parser = IDLParser()
+                entries = [
+                    (
+                        stub_docname(relpath, obj.name),
+                        obj.name,
+                        content_hash(json.dumps(parser.dump(obj))),
+                        [("routine", obj.name)],
+                    )
+                    for obj in domain.parse_source(text)
+                ]
+            for docname, title, digest, options in entries:
+                origin = f"{path}:{title}" if granularity == "routine" else path
+                if docname in origins:
+                    logger.warning(
+                        "[idl] %s and %s both map to stub %s/%s, skipping the second",
+                        origins[docname],
+                        origin,
+                        output,
+                        docname,
+                    )
+                    continue
+                origins[docname] = origin
+                stubs[os.path.join(directory, docname + ".rst")] = render_stub(
+                    title, f".. idl:autofile:: {abspath}", digest, options
+                )
+
+        stubs[os.path.join(directory, "index.rst")] = render_index(
+            os.path.basename(os.path.normpath(output)), sorted(origins)
+        )
+
+        for path, text in stubs.items():
+            written += write_stub(path, text)
+        for stale in find_stubs(directory) - {os.path.normpath(path) for path in stubs}:
+            os.unlink(stale)
+        logger.info("[idl] %d of %d stubs in %s updated", written, len(stubs), output)
@@ -0,0 +1,28 @@
+#
+#  utils.py
+#  sphinx-idl
+#
+#  Small helpers shared by the sphinx-idl tools.
+#
+
+import os
+import tempfile
+
+__all__ = ["atomic_write"]
+
+
+def atomic_write(path, data):
+    """Write bytes to a file so that readers only ever see the complete contents."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
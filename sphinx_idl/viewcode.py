@@ -0,0 +1,163 @@
+#
+#  viewcode.py
+#  sphinx-idl
+#
+#  Highlighted source pages for documented IDL routines, like sphinx.ext.viewcode.
+#
+
+import html
+import os
+import posixpath
+
+from docutils import nodes
+from sphinx import addnodes
+from sphinx.locale import _
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.util import logging
+from sphinx.util.nodes import make_refnode
+
+from .parser import content_hash
+from .utils import atomic_write
+
+__all__ = ["setup"]
+
+logger = logging.getLogger(__name__)
+
+#: The directory of the output which holds the source pages.
+OUTPUT_DIRNAME = "_idl_sources"
+
+
+class idl_source_anchor(nodes.Element):
+    """Placeholder for the "[source]" link of a routine, converted to a link by HTML builders."""
+
+
+def is_supported_builder(builder):
+    """Whether a builder produces source pages."""
+    return builder.format == "html" and builder.name != "singlehtml" and not builder.name.startswith("epub")
+
+
+def source_pagename(path):
+    """The name of the page showing an IDL source file, for a path relative to the documentation sources."""
+    parts = [part if part != ".." else "_" for part in path.replace(os.sep, "/").split("/")]
+    return posixpath.join(OUTPUT_DIRNAME, posixpath.splitext("/".join(parts))[0])
+
+
+def add_source_links(app, doctree):
+    """Add a "[source]" link to each IDL routine described in a document."""
+    env = app.env
+    sources = env.get_domain("idl").data["sources"]
+    for objnode in doctree.findall(addnodes.desc):
+        if objnode.get("domain") != "idl":
+            continue
+        for signode in objnode:
+            if not isinstance(signode, addnodes.desc_signature):
+                continue
+            fullname = signode.get("fullname")
+            source = sources.get(fullname)
+            if source is None or source[0] != env.docname:
+                continue
+            signode += idl_source_anchor(reftarget=source_pagename(source[1]), refid=fullname, refdoc=env.docname)
+
+
+class SourceAnchorTransform(SphinxPostTransform):
+    """Convert source link placeholders into links, or remove them for builders without source pages."""
+
+    default_priority = 100
+
+    def run(self, **kwargs):
+        supported = is_supported_builder(self.app.builder)
+        for node in list(self.document.findall(idl_source_anchor)):
+            if not supported:
+                node.parent.remove(node)
+                continue
+            anchor = nodes.inline("", _("[source]"), classes=["viewcode-link"])
+            node.replace_self(make_refnode(self.app.builder, node["refdoc"], node["reftarget"], node["refid"], anchor))
+
+
+def highlight(app, text):
+    """Highlight IDL source as HTML, re-using the result for sources which were highlighted before."""
+    import pygments
+
+    directory = app.config.idl_viewcode_cache
+    if directory:
+        directory = os.path.join(app.srcdir, directory)
+    else:
+        directory = os.path.join(app.doctreedir, "idl_viewcode")
+    digest = content_hash(text)
+    path = os.path.join(directory, f"pygments-{pygments.__version__}", digest[:2], f"{digest}.html")
+    try:
+        with open(path, encoding="utf-8") as stream:
+            return stream.read()
+    except OSError:
+        pass
+    highlighted = app.builder.highlighter.highlight_block(text, "idl", linenos=False)
+    try:
+        atomic_write(path, highlighted.encode("utf-8"))
+    except OSError:
+        # The cache is only an optimization, so a read-only or full cache directory is not an error.
+        pass
+    return highlighted
+
+
+def collect_pages(app):
+    """Generate a highlighted page for each IDL source file with documented routines, and an index of them."""
+    if not is_supported_builder(app.builder):
+        return
+    urito = app.builder.get_relative_uri
+    files = {}
+    for fullname, (docname, path, start, end) in app.env.get_domain("idl").data["sources"].items():
+        files.setdefault(path, []).append((start, end, fullname, docname))
+    if not files:
+        return
+
+    index = posixpath.join(OUTPUT_DIRNAME, "index")
+    for path, routines in sorted(files.items()):
+        try:
+            with open(os.path.join(app.srcdir, path), encoding="utf-8") as stream:
+                text = stream.read()
+        except (OSError, UnicodeError) as error:
+            logger.warning("[idl] can't read %s for its source page: %s", path, error)
+            continue
+        pagename = source_pagename(path)
+        lines = highlight(app, text).splitlines()
+        # Split off the wrapping markup, so that each line of code is at the index of its line number.
+        before, after = lines[0].split("<pre>", 1)
+        lines[0:1] = [before + "<pre>", after]
+        max_index = len(lines) - 1
+        link_text = _("[docs]")
+        for start, end, fullname, docname in sorted(routines):
+            if start > max_index:
+                continue
+            backlink = html.escape(urito(pagename, docname) + "#" + fullname)
+            lines[start] = '<div class="viewcode-block" id="%s">\n<a class="viewcode-back" href="%s">%s</a>\n%s' % (
+                html.escape(fullname),
+                backlink,
+                link_text,
+                lines[start],
+            )
+            lines[min(end, max_index)] += "</div>\n"
+        context = {
+            "parents": [{"link": urito(pagename, index), "title": _("IDL source code")}],
+            "title": path,
+            "body": _("<h1>Source code for %s</h1>") % html.escape(path) + "\n".join(lines),
+        }
+        yield (pagename, context, "page.html")
+
+    items = "".join(
+        '<li><a href="%s">%s</a></li>\n' % (html.escape(urito(index, source_pagename(path))), html.escape(path))
+        for path in sorted(files)
+    )
+    context = {
+        "title": _("Overview: IDL source code"),
+        "body": _("<h1>All IDL files for which code is available</h1>") + f"<ul>\n{items}</ul>",
+    }
+    yield (index, context, "page.html")
+
+
+def setup(app):
+    app.setup_extension("sphinx_idl.domain")
+    app.add_config_value("idl_viewcode_cache", None, "")
+    app.add_post_transform(SourceAnchorTransform)
+    app.connect("doctree-read", add_source_links)
+    app.connect("html-collect-pages", collect_pages)
+    return {"parallel_read_safe": True, "parallel_write_safe": True}
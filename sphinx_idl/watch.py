@@ -0,0 +1,153 @@
+#
+#  watch.py
+#  sphinx-idl
+#
+#  Rebuild documentation as IDL sources change, keeping parsed sources in memory.
+#
+"""
+Rebuild Sphinx documentation whenever IDL sources or documents change.
+
+Run it as ``python -m sphinx_idl.watch SOURCEDIR OUTDIR -w IDL_DIRECTORY [-w IDL_DIRECTORY ...]``. Sources are
+polled for changes by modification time, only changed IDL files are parsed again, and only the documents which
+depend on changed files are rebuilt.
+"""
+
+import os
+import sys
+import time
+import traceback
+
+from .cache import MemoryCache
+from .index import find_sources
+from .parser import IDLParser, content_hash
+
+__all__ = ["Watcher", "main"]
+
+
+class Watcher:
+    """Track a set of IDL source files, keeping the parsed routines of each in memory."""
+
+    def __init__(self, paths, pattern="*.pro", encoding="utf-8", cache=None):
+        super().__init__()
+        self.paths = paths
+        self.pattern = pattern
+        self.encoding = encoding
+        self.cache = cache if cache is not None else MemoryCache()
+        self.mtimes = {}
+        self.digests = {}
+
+    def scan(self):
+        """Parse IDL files which changed since the last scan, returning the paths which changed."""
+        mtimes = {}
+        for path in find_sources(self.paths, self.pattern):
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+        changed = [path for path, mtime in mtimes.items() if self.mtimes.get(path) != mtime]
+        removed = sorted(set(self.mtimes) - set(mtimes))
+        for path in changed:
+            self.parse(path)
+        for path in removed:
+            self.cache.discard(self.digests.pop(path, None))
+        self.mtimes = mtimes
+        return changed + removed
+
+    def parse(self, path):
+        """Parse one file into the cache, unless its contents are already there."""
+        try:
+            with open(path, encoding=self.encoding) as stream:
+                text = stream.read()
+        except (OSError, UnicodeError):
+            return
+        digest = content_hash(text)
+        previous = self.digests.get(path)
+        if previous is not None and previous != digest:
+            self.cache.discard(previous)
+        if self.cache.get(digest) is None:
+            parser = IDLParser()
+            self.cache.put(digest, [parser.dump(obj) for obj in parser.parse(text.splitlines(True))])
+        self.digests[path] = digest
+
+
+def document_mtimes(srcdir, outdir):
+    """Modification times of the files in the documentation source directory, excluding the output."""
+    mtimes = {}
+    outdir = os.path.abspath(outdir)
+    for dirpath, dirnames, filenames in os.walk(srcdir):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith(".") and os.path.abspath(os.path.join(dirpath, name)) != outdir
+        ]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+    return mtimes
+
+
+def build(app, *steps):
+    """Run some preparation steps and a build, reporting errors instead of raising them so that watching goes on.
+
+    Returns True if the build succeeded.
+    """
+    try:
+        for step in steps:
+            step(app)
+        app.build()
+    except Exception:
+        traceback.print_exc()
+        print("Build failed, waiting for changes", file=sys.stderr)
+        return False
+    return True
+
+
+def main(argv=None):
+    """Command line entry point."""
+    import argparse
+
+    from sphinx.application import Sphinx
+
+    from .domain import IDLDomain
+    from .stubs import generate_stubs
+
+    parser = argparse.ArgumentParser(prog="python -m sphinx_idl.watch", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sourcedir", help="documentation source directory")
+    parser.add_argument("outdir", help="output directory")
+    parser.add_argument("-w", "--watch", action="append", required=True, help="IDL source directory to watch")
+    parser.add_argument("-b", "--builder", default="html", help="builder to use (default: html)")
+    parser.add_argument("--glob", default="*.pro", help="pattern for IDL source files inside watched directories")
+    parser.add_argument("--encoding", default="utf-8", help="encoding of the IDL source files")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between scans for changes")
+    args = parser.parse_args(argv)
+
+    watcher = Watcher(args.watch, args.glob, args.encoding)
+    IDLDomain.memory_cache = watcher.cache
+    watcher.scan()
+
+    app = Sphinx(args.sourcedir, args.sourcedir, args.outdir, os.path.join(args.outdir, ".doctrees"), args.builder)
+    build(app)
+    # Snapshot after building, so that files written by the build itself (stubs, parse cache entries) don't look
+    # like edits.
+    documents = document_mtimes(args.sourcedir, args.outdir)
+    try:
+        while True:
+            time.sleep(args.interval)
+            changed = watcher.scan()
+            if not changed and document_mtimes(args.sourcedir, args.outdir) == documents:
+                continue
+            start = time.perf_counter()
+            # builder-inited is only emitted once, so stubs for new files and routines are written here.
+            if build(app, generate_stubs):
+                print(f"Rebuilt in {time.perf_counter() - start:.2f}s ({len(changed)} IDL files changed)")
+            documents = document_mtimes(args.sourcedir, args.outdir)
+    except KeyboardInterrupt:
+        pass
+    return app.statuscode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#
+#  test_autopath_scaling.py
+#  sphinx-idl
+#
+#  idl:autopath should splice the content for all its files into the document at once.
+#
+
+import io
+import time
+
+import pytest
+from docutils.statemachine import StringList
+from sphinx.application import Sphinx
+
+from sphinx_idl.auto import IDLAutoBase, IDLAutoPath
+
+ROUTINE = """;+
+; Routine {name}.
+;
+; :param x: The input.
+;-
+pro {name}, x
+  print, x
+end
+
+"""
+
+
+def make_project(srcdir, nfiles, ndirectives=1):
+    """Write a project documenting ``nfiles`` IDL files in each of ``ndirectives`` directories with idl:autopath."""
+    srcdir.mkdir(parents=True)
+    (srcdir / "conf.py").write_text('extensions = ["sphinx_idl.domain", "sphinx_idl.auto"]\n')
+    body = ""
+    for d in range(ndirectives):
+        (srcdir / f"src{d}").mkdir()
+        for i in range(nfiles):
+            text = "".join(ROUTINE.format(name=f"r{d}_{i}_{j}") for j in range(3))
+            (srcdir / f"src{d}" / f"f{i}.pro").write_text(text)
+        body += f".. idl:autopath:: {srcdir / f'src{d}'}/\n   :summary:\n\n"
+    (srcdir / "index.rst").write_text(f"Test\n====\n\n{body}")
+
+
+def build(srcdir):
+    app = Sphinx(
+        str(srcdir),
+        str(srcdir),
+        str(srcdir / "_build"),
+        str(srcdir / "_doctrees"),
+        "dummy",
+        status=io.StringIO(),
+        warning=io.StringIO(),
+    )
+    app.build()
+    return app
+
+
+def count_splices(monkeypatch, srcdir, nfiles, ndirectives):
+    """Build a project, counting the calls to insert_content and the insertions into any StringList by autopath."""
+    make_project(srcdir, nfiles, ndirectives)
+    counts = {"insert_content": 0, "insert": 0, "autopath": 0}
+    insert_content, insert, run = IDLAutoBase.insert_content, StringList.insert, IDLAutoPath.run
+
+    def counting_insert_content(self, *args, **kwargs):
+        counts["insert_content"] += 1
+        return insert_content(self, *args, **kwargs)
+
+    def counting_insert(self, *args, **kwargs):
+        if counts["autopath"]:
+            counts["insert"] += 1
+        return insert(self, *args, **kwargs)
+
+    def counting_run(self):
+        counts["autopath"] += 1
+        try:
+            return run(self)
+        finally:
+            counts["autopath"] -= 1
+
+    with monkeypatch.context() as patch:
+        patch.setattr(IDLAutoBase, "insert_content", counting_insert_content)
+        patch.setattr(StringList, "insert", counting_insert)
+        patch.setattr(IDLAutoPath, "run", counting_run)
+        app = build(srcdir)
+    assert len(app.env.get_domain("idl").data["objects"]) == 3 * nfiles * ndirectives
+    return counts
+
+
+def test_autopath_splices_once(tmp_path, monkeypatch):
+    small = count_splices(monkeypatch, tmp_path / "small", 5, 2)
+    large = count_splices(monkeypatch, tmp_path / "large", 50, 2)
+    assert small["insert_content"] == large["insert_content"] == 2
+    # Splicing each file separately would make the number of insertions grow with the number of files.
+    assert small["insert"] == large["insert"]
+
+
+def autopath_time(srcdir, nfiles):
+    """Build a project documenting ``nfiles`` IDL files with one idl:autopath, returning the time spent in the
+    directive."""
+    make_project(srcdir, nfiles)
+    elapsed = []
+    run = IDLAutoPath.run
+
+    def timed_run(self):
+        start = time.perf_counter()
+        try:
+            return run(self)
+        finally:
+            elapsed.append(time.perf_counter() - start)
+
+    IDLAutoPath.run = timed_run
+    try:
+        build(srcdir)
+    finally:
+        IDLAutoPath.run = run
+    assert len(elapsed) == 1
+    return elapsed[0]
+
+
+@pytest.mark.benchmark
+def test_autopath_scales_linearly(tmp_path):
+    small, large = 50, 400
+    ratio = autopath_time(tmp_path / str(large), large) / autopath_time(tmp_path / str(small), small)
+    # Eight times the files should take about eight times as long. The time is dominated by Sphinx's own directive
+    # processing, so this does not tell a single splice from one per file: see test_autopath_splices_once.
+    assert ratio < 20, f"{large} files took {ratio:.1f} times as long as {small} files"
@@ -0,0 +1,66 @@
+#
+#  test_imports.py
+#  sphinx-idl
+#
+#  Keep the extensions cheap to import.
+#
+
+import subprocess
+import sys
+
+#: Modules which the extensions only import when a feature needs them.
+DEFERRED = (
+    "sphinx.ext.autosummary",
+    "sphinx.ext.autodoc",
+    "sphinx.domains.python",
+    "docutils.utils.error_reporting",
+    "sphinx_idl.index",
+    "sphinx_idl.cache",
+    "sqlite3",
+    "concurrent.futures",
+    "argparse",
+)
+
+#: Printed between the imports of Sphinx and of the statement under test.
+MARKER = "--- sphinx imported ---"
+
+#: Generous upper bound on the time to import the extensions, once Sphinx itself is imported.
+BUDGET_US = 250_000
+
+
+def import_times(statement):
+    """Run ``statement`` after importing Sphinx's HTML builder, returning the cumulative import time of each top
+    level module it imports, as reported by ``python -X importtime``."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, sphinx.builders.html; print({MARKER!r}, file=sys.stderr); {statement}",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    stderr = result.stderr.split(MARKER, 1)[1]
+    imported = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            imported[name.strip()] = (int(cumulative), not name.startswith("  "))
+    return imported
+
+
+def test_extensions_defer_heavy_imports():
+    imported = import_times("import sphinx_idl.domain, sphinx_idl.auto, sphinx_idl.viewcode")
+    assert "sphinx_idl.domain" in imported
+    assert not [name for name in DEFERRED if name in imported]
+
+
+def test_extensions_import_quickly():
+    imported = import_times("import sphinx_idl.domain, sphinx_idl.auto, sphinx_idl.viewcode")
+    total = sum(cumulative for cumulative, top_level in imported.values() if top_level)
+    assert total < BUDGET_US
@@ -0,0 +1,86 @@
+#
+#  test_inventory_pickle.py
+#  sphinx-idl
+#
+#  CompactInventory should pickle smaller and load faster than the plain dict of (docname, objtype) it replaced.
+#
+
+import io
+import pickle
+import time
+
+from sphinx.application import Sphinx
+
+from sphinx_idl.inventory import CompactInventory
+
+DOCUMENTS = 100
+
+OBJECTS = 40
+
+REPEATS = 20
+
+
+def read_project(tmp_path, monkeypatch):
+    """Read a project, returning its inventory and the plain dict of the values the domain stored in it."""
+    srcdir = tmp_path / "src"
+    srcdir.mkdir()
+    (srcdir / "conf.py").write_text('extensions = ["sphinx_idl.domain"]\n')
+    toctree = "".join(f"   group{i // 10}/module_{i}\n" for i in range(DOCUMENTS))
+    (srcdir / "index.rst").write_text(f"Index\n=====\n\n.. toctree::\n\n{toctree}")
+    for i in range(DOCUMENTS):
+        body = "".join(
+            f".. idl:{'pro' if j % 2 else 'function'}:: module_{i}_routine_{j}, x\n\n   A routine.\n\n"
+            for j in range(OBJECTS)
+        )
+        (srcdir / f"group{i // 10}").mkdir(exist_ok=True)
+        (srcdir / f"group{i // 10}" / f"module_{i}.rst").write_text(f"Module {i}\n=========\n\n{body}")
+
+    # Keep the very (docname, objtype) objects the domain stores, so that the plain dict shares repeated strings
+    # exactly as it did when it was the inventory.
+    plain = {}
+    setitem = CompactInventory.__setitem__
+
+    def recording_setitem(self, fullname, value):
+        plain[fullname] = value
+        setitem(self, fullname, value)
+
+    monkeypatch.setattr(CompactInventory, "__setitem__", recording_setitem)
+    app = Sphinx(
+        str(srcdir),
+        str(srcdir),
+        str(tmp_path / "build"),
+        str(tmp_path / "doctrees"),
+        "dummy",
+        status=io.StringIO(),
+        warning=io.StringIO(),
+    )
+    app.build()
+    return app.env.get_domain("idl").data["objects"], plain
+
+
+def load_time(data):
+    """The best time to unpickle some data, in seconds."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        pickle.loads(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_inventory_pickle(tmp_path, monkeypatch):
+    inventory, plain = read_project(tmp_path, monkeypatch)
+    assert isinstance(inventory, CompactInventory)
+    assert len(plain) == len(inventory) == DOCUMENTS * OBJECTS
+    assert dict(inventory.items()) == plain
+
+    compact_data = pickle.dumps(inventory, pickle.HIGHEST_PROTOCOL)
+    plain_data = pickle.dumps(plain, pickle.HIGHEST_PROTOCOL)
+    assert dict(pickle.loads(compact_data).items()) == plain
+
+    # Docnames are shared by all the objects of a document, but each directive makes its own object type string. The
+    # plain dict pickles to about 1.5 times the size of the compact inventory, and takes about 1.7 times as long to
+    # load, on the machine where this was written.
+    assert len(compact_data) < len(plain_data)
+    compact_time, plain_time = load_time(compact_data), load_time(plain_data)
+    assert compact_time < plain_time, f"loaded in {compact_time:.5f} s, a plain dict in {plain_time:.5f} s"
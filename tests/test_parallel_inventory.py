@@ -0,0 +1,97 @@
+#
+#  test_parallel_inventory.py
+#  sphinx-idl
+#
+#  Parallel readers must not hold the SQLite inventory's write lock while they read documents.
+#
+
+import io
+import os
+import sqlite3
+
+import pytest
+from sphinx.application import Sphinx
+from sphinx.util.parallel import parallel_available
+
+DOCUMENTS = 60
+
+DOCUMENT = """Document {i}
+===========
+
+.. idl:pro:: p{i}, x
+
+   A procedure.
+
+.. idl:function:: f{i}(x)
+
+   A function calling :idl:pro:`p{next}`.
+"""
+
+CONF = """import os
+import sqlite3
+
+extensions = ["sphinx_idl.domain"]
+idl_inventory = "sqlite"
+
+
+def check_lock(app, doctree):
+    # Try to take the write lock. Other readers' checks only hold it for an instant, so this fails when a reader
+    # (this one included) holds a write transaction while it reads its documents.
+    path = os.path.join(app.doctreedir, "idl-objects.sqlite")
+    connection = sqlite3.connect(path, timeout=1)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.rollback()
+        locked = False
+    except sqlite3.OperationalError:
+        locked = True
+    finally:
+        connection.close()
+    with open(os.path.join(app.outdir, os.pardir, "readers.txt"), "a") as stream:
+        stream.write(f"{os.getpid()} {app.env.docname} {locked}\\n")
+
+
+def setup(app):
+    app.connect("doctree-read", check_lock)
+"""
+
+
+@pytest.mark.skipif(not parallel_available, reason="parallel builds need fork()")
+def test_parallel_read_sqlite(tmp_path):
+    srcdir = tmp_path / "src"
+    srcdir.mkdir()
+    (srcdir / "conf.py").write_text(CONF)
+    toctree = "".join(f"   d{i}\n" for i in range(DOCUMENTS))
+    (srcdir / "index.rst").write_text(f"Index\n=====\n\n.. toctree::\n\n{toctree}")
+    for i in range(DOCUMENTS):
+        (srcdir / f"d{i}.rst").write_text(DOCUMENT.format(i=i, next=(i + 1) % DOCUMENTS))
+
+    app = Sphinx(
+        str(srcdir),
+        str(srcdir),
+        str(tmp_path / "build" / "html"),
+        str(tmp_path / "doctrees"),
+        "html",
+        status=io.StringIO(),
+        warning=io.StringIO(),
+        parallel=4,
+    )
+    app.build()
+
+    with open(tmp_path / "build" / "readers.txt") as stream:
+        readers = [line.split() for line in stream]
+    assert len(readers) == DOCUMENTS + 1
+    assert (
+        len({pid for pid, _docname, _locked in readers} - {str(os.getpid())}) > 1
+    ), "documents weren't read in parallel"
+    assert [docname for _pid, docname, locked in readers if locked == "True"] == []
+
+    connection = sqlite3.connect(str(tmp_path / "doctrees" / "idl-objects.sqlite"))
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 2 * DOCUMENTS
+    finally:
+        connection.close()
+    for i in range(DOCUMENTS):
+        following = (i + 1) % DOCUMENTS
+        html = (tmp_path / "build" / "html" / f"d{i}.html").read_text()
+        assert f'href="d{following}.html#p{following}"' in html
@@ -0,0 +1,69 @@
+#
+#  test_read_throughput.py
+#  sphinx-idl
+#
+#  IDLSourceFile should read IDL sources at least as fast as docutils.io.FileInput, which it replaced.
+#
+
+import time
+
+import pytest
+from docutils.io import FileInput
+
+from sphinx_idl.auto import IDLSourceFile
+
+ROUTINE = """;+
+; Routine {name}.{extra}
+;
+; :param x: The input.
+;-
+pro {name}, x
+  print, x
+end
+
+"""
+
+NFILES = 2000
+
+REPEATS = 5
+
+
+def write_sources(tmp_path, extra):
+    """Write small IDL sources with three routines each, returning their paths."""
+    paths = []
+    for i in range(NFILES):
+        path = tmp_path / f"f{i}.pro"
+        path.write_text("".join(ROUTINE.format(name=f"r{i}_{j}", extra=extra) for j in range(3)), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def read_fileinput(paths):
+    return [FileInput(source_path=path, encoding="utf-8-sig", error_handler="strict").read() for path in paths]
+
+
+def read_sourcefile(paths):
+    return [IDLSourceFile.open(path, "utf-8-sig", "strict").read() for path in paths]
+
+
+def throughput(read, paths):
+    """The best of a few runs of reading all the files, in files per second."""
+    read(paths)
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        read(paths)
+        best = min(best, time.perf_counter() - start)
+    return len(paths) / best
+
+
+@pytest.mark.parametrize("extra", ["", " Größe in µm, température"], ids=["ascii", "non-ascii"])
+def test_read_throughput(tmp_path, extra):
+    paths = write_sources(tmp_path, extra)
+    assert read_sourcefile(paths) == read_fileinput(paths)
+
+    before = throughput(read_fileinput, paths)
+    after = throughput(read_sourcefile, paths)
+    # FileInput reads about 55k of these files per second, and IDLSourceFile one and a half to two and a half times
+    # as many, on the machine where this was written.
+    assert after > before, f"IDLSourceFile read {after:.0f} files/s, FileInput {before:.0f} files/s"
@@ -0,0 +1,116 @@
+#
+#  test_threads.py
+#  sphinx-idl
+#
+#  The parser and the caches it feeds must give the same results when used from many threads at once.
+#
+
+import concurrent.futures
+import glob
+import json
+import os
+
+from sphinx_idl.cache import MemoryCache
+from sphinx_idl.index import SymbolIndex
+from sphinx_idl.inventory import SQLiteInventory
+from sphinx_idl.parser import IDLParser, content_hash
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, "examples", "source")
+
+CLASS_SOURCE = """;+
+; Initialize a widget.
+;-
+function Widget::init, size
+  self.size = size
+  return, 1
+end
+
+;+
+; Draw the widget.
+;-
+pro Widget::draw, window
+  plot_it, self.size, $
+    window
+end
+
+;+
+; A graphical widget.
+;-
+pro Widget__define, void
+  void = {Widget, size: 0L, $
+          INHERITS IDL_Object}
+end
+"""
+
+THREADS = 16
+
+
+def corpus():
+    """IDL sources covering routines, methods, class definitions and continuation lines."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES, "**", "*.pro"), recursive=True)):
+        with open(path, encoding="utf-8") as stream:
+            texts.append(stream.read())
+    texts += [CLASS_SOURCE.replace("Widget", f"Widget{i}") for i in range(50)]
+    return texts
+
+
+def parse_all(parser, texts):
+    return [[parser.dump(obj) for obj in parser.parse(text.splitlines(True))] for text in texts]
+
+
+def test_parse_from_many_threads():
+    texts = corpus()
+    parser = IDLParser()
+    expected = parse_all(IDLParser(), texts)
+    # The corpus includes class fields and methods.
+    assert any(obj.members for text in texts for obj in parser.parse(text.splitlines(True)))
+    with concurrent.futures.ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(lambda _: parse_all(parser, texts), range(THREADS * 4)))
+    assert all(result == expected for result in results)
+
+
+def test_load_records_from_many_threads():
+    texts = corpus()
+    parser = IDLParser()
+    cache = MemoryCache()
+    expected = parse_all(parser, texts)
+    digests = [content_hash(text) for text in texts]
+    for i, digest in enumerate(digests):
+        cache.put(digest, expected[i])
+
+    def load_all(_):
+        dumps = []
+        for digest in digests:
+            objects = [parser.load(record) for record in cache.get(digest)]
+            dumps.append(json.dumps([parser.dump(obj) for obj in objects]))
+            for obj in objects:
+                # Routines must not share their lists with the cached records.
+                obj.calls.append("scribble")
+        return dumps
+
+    with concurrent.futures.ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(load_all, range(THREADS * 2)))
+    assert [cache.get(digest) for digest in digests] == parse_all(parser, texts)
+    assert all(result == [json.dumps(records) for records in expected] for result in results)
+
+
+def test_symbol_index_loaded_once(tmp_path):
+    path = str(tmp_path / "idl-index.json")
+    SymbolIndex({"a.pro": {"hash": "0", "symbols": []}}).save(path)
+    with concurrent.futures.ThreadPoolExecutor(THREADS) as pool:
+        indexes = list(pool.map(lambda _: SymbolIndex.cached(path), range(THREADS * 4)))
+    assert all(index is indexes[0] for index in indexes)
+
+
+def test_sqlite_inventory_from_many_threads(tmp_path):
+    inventory = SQLiteInventory(str(tmp_path / "objects.sqlite"))
+
+    def describe(i):
+        for j in range(200):
+            inventory[f"r{i}_{j}"] = (f"doc{i}", "pro")
+        return sum(f"r{i}_{j}" in inventory for j in range(200))
+
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(describe, range(8))) == [200] * 8
+    assert len(inventory) == 1600